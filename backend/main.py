@@ -3,14 +3,21 @@ Pioneer + OpenAI Integration Example
 A simple chat application demonstrating personalization with Fastino's Pioneer API
 """
 import os
+import asyncio
+import random
+from contextlib import asynccontextmanager
 from typing import List, Dict, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 from dotenv import load_dotenv
 import httpx
-from openai import OpenAI
+import orjson
+from cachetools import TTLCache
+from openai import AsyncOpenAI, APIConnectionError, RateLimitError, InternalServerError
 
 # Load environment variables
 load_dotenv()
@@ -20,14 +27,78 @@ PIONEER_API_KEY = os.getenv("PIONEER_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PIONEER_BASE_URL = "https://api.fastino.ai"
 
+# Request size limits enforced on incoming chat requests
+MAX_MESSAGE_CHARS = 8000
+MAX_REQUEST_HISTORY_MSGS = 200
+
+# Conversation history window sent to Pioneer/OpenAI
+MAX_HISTORY_MSGS = 20
+MAX_HISTORY_CHARS = 16_000
+
+# User summaries change slowly, so cache them briefly between chat turns
+SUMMARY_CACHE_TTL = 60
+SUMMARY_CACHE_SIZE = 10_000
+UNKNOWN_USER_CACHE_TTL = 10
+
+# New messages are buffered per user and ingested in batches
+INGEST_MAX_BATCH = 32
+INGEST_MAX_WAIT = 0.5
+
+# Retries for transient Pioneer/OpenAI failures (exponential backoff with jitter)
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 5.0
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# Statuses that mean the request was not processed, safe to retry for non-idempotent calls
+RETRY_UNPROCESSED_STATUS_CODES = {429, 503}
+
+# Limits for streamed chat responses
+MAX_STREAM_CHUNK_CHARS = 16 * 1024
+MAX_STREAM_CHARS = 10 * 1024 * 1024
+STREAM_INCOMPLETE_MARKER = "\n\n[Response incomplete]"
+
 if not PIONEER_API_KEY:
     raise ValueError("PIONEER_API_KEY environment variable is required")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
+# Headers for Pioneer API requests, set once on the shared client
+PIONEER_HEADERS = {
+    "x-api-key": PIONEER_API_KEY,
+    "Content-Type": "application/json"
+}
+
 # Initialize clients
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-app = FastAPI(title="Pioneer + OpenAI Chat Example")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared Pioneer and OpenAI clients so connections are pooled and kept alive, and start the ingest batcher"""
+    app.state.pioneer = httpx.AsyncClient(
+        base_url=PIONEER_BASE_URL,
+        headers=PIONEER_HEADERS,
+        timeout=httpx.Timeout(30.0),
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=200, keepalive_expiry=60)
+    )
+    # Retries are handled by create_chat_completion, so the SDK's own retries are disabled
+    app.state.openai_http = httpx.AsyncClient(
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30)
+    )
+    app.state.openai = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=app.state.openai_http, max_retries=0)
+    app.state.ingest_batcher = IngestBatcher(app.state.pioneer)
+    app.state.ingest_batcher.start()
+    try:
+        yield
+    finally:
+        await app.state.ingest_batcher.close()
+        await app.state.openai.close()
+        await app.state.openai_http.aclose()
+        await app.state.pioneer.aclose()
+
+app = FastAPI(
+    title="Pioneer + OpenAI Chat Example",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -38,15 +109,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Request/Response Models
 class Message(BaseModel):
     role: str
     content: str
     timestamp: Optional[str] = None
+    
+    @field_validator("content")
+    @classmethod
+    def truncate_content(cls, content: str) -> str:
+        # Over-long history entries are truncated rather than rejected, so one bad
+        # message in the client's history can't fail every later request
+        return content[:MAX_MESSAGE_CHARS]
 
 class ChatRequest(BaseModel):
-    message: str
-    conversation_history: List[Message] = []
+    message: str = Field(max_length=MAX_MESSAGE_CHARS)
+    conversation_history: List[Message] = Field(default_factory=list, max_length=MAX_REQUEST_HISTORY_MSGS)
     user_id: Optional[str] = None
     user_email: Optional[str] = None  # For debugging/logging only
 
@@ -61,137 +142,290 @@ class RegisterUserRequest(BaseModel):
     timezone: Optional[str] = None
 
 # Helper Functions
-def get_pioneer_headers():
-    """Get headers for Pioneer API requests"""
-    return {
-        "x-api-key": PIONEER_API_KEY,
-        "Content-Type": "application/json"
-    }
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before the next retry, honoring a Retry-After header when present"""
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return min(RETRY_BASE_DELAY * 2 ** attempt + random.random() * RETRY_BASE_DELAY, RETRY_MAX_DELAY)
 
-async def register_pioneer_user(email: str, name: Optional[str] = None, timezone: Optional[str] = None):
+async def pioneer_request(client: httpx.AsyncClient, method: str, url: str, idempotent: bool = True, **kwargs) -> httpx.Response:
+    """
+    Send a Pioneer API request, retrying timeouts, network errors and transient status codes.
+    
+    Non-idempotent requests are only retried on statuses that mean the request was not
+    processed, since a timed-out request may still have succeeded upstream.
+    """
+    retry_status_codes = RETRY_STATUS_CODES if idempotent else RETRY_UNPROCESSED_STATUS_CODES
+    for attempt in range(RETRY_ATTEMPTS):
+        last_attempt = attempt == RETRY_ATTEMPTS - 1
+        try:
+            response = await client.request(method, url, **kwargs)
+        except (httpx.TimeoutException, httpx.NetworkError) as e:
+            if last_attempt or not idempotent:
+                raise
+            print(f"[ERROR] Pioneer {method} {url} failed: {e!r}, retrying")
+            await asyncio.sleep(retry_delay(attempt))
+            continue
+        
+        if response.status_code not in retry_status_codes or last_attempt:
+            return response
+        print(f"[ERROR] Pioneer {method} {url} returned {response.status_code}, retrying")
+        await asyncio.sleep(retry_delay(attempt, response.headers.get("Retry-After")))
+
+def now_iso() -> str:
+    """Current UTC time as an ISO 8601 string with a Z suffix"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+def trim_history(history: List[Message]) -> List[Message]:
+    """Keep system messages plus the newest messages that fit the history window"""
+    # The request schema caps history at MAX_REQUEST_HISTORY_MSGS, so this scan stays cheap
+    system_msgs = [msg for msg in history if msg.role == "system"]
+    budget = MAX_HISTORY_CHARS - sum(len(msg.content) for msg in system_msgs)
+    recent = []
+    for msg in reversed(history):
+        if msg.role == "system":
+            continue
+        if len(recent) >= MAX_HISTORY_MSGS or len(msg.content) > budget:
+            break
+        budget -= len(msg.content)
+        recent.append(msg)
+    recent.reverse()
+    return system_msgs + recent
+
+async def register_pioneer_user(client: httpx.AsyncClient, email: str, name: Optional[str] = None, timezone: Optional[str] = None):
     """Register a user with Pioneer API"""
-    async with httpx.AsyncClient() as client:
-        payload = {
-            "email": email,
-            "purpose": "A personalized AI chat assistant that learns from conversations and adapts to user preferences",
-            "traits": {}
-        }
+    payload = {
+        "email": email,
+        "purpose": "A personalized AI chat assistant that learns from conversations and adapts to user preferences",
+        "traits": {}
+    }
+    
+    if name:
+        payload["traits"]["name"] = name
+    if timezone:
+        payload["traits"]["timezone"] = timezone
         
-        if name:
-            payload["traits"]["name"] = name
-        if timezone:
-            payload["traits"]["timezone"] = timezone
-            
-        response = await client.post(
-            f"{PIONEER_BASE_URL}/register",
-            headers=get_pioneer_headers(),
-            json=payload,
-            timeout=30.0
+    response = await pioneer_request(
+        client,
+        "POST",
+        "/register",
+        idempotent=False,
+        content=orjson.dumps(payload),
+        timeout=30.0
+    )
+    
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Failed to register user with Pioneer: {response.text}"
         )
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Failed to register user with Pioneer: {response.text}"
-            )
-        
-        return response.json()
+    
+    return orjson.loads(response.content)
 
-async def get_user_summary(user_id: str, max_chars: int = 1000) -> Optional[str]:
+async def get_user_summary(client: httpx.AsyncClient, user_id: str, max_chars: int = 1000) -> Optional[str]:
     """Get user profile summary from Pioneer"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{PIONEER_BASE_URL}/summary",
-                headers=get_pioneer_headers(),
-                params={"user_id": user_id, "max_chars": max_chars},
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("summary")
-            else:
-                print(f"[ERROR] Failed to get user summary. Status: {response.status_code}, Response: {response.text}")
-            return None
-        except Exception as e:
-            print(f"[ERROR] Exception fetching user summary: {e}")
-            return None
+    try:
+        response = await pioneer_request(
+            client,
+            "GET",
+            "/summary",
+            params={"user_id": user_id, "max_chars": max_chars},
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            return data.get("summary")
+        elif response.status_code == 404:
+            # Remember unknown users briefly so repeated requests don't hammer Pioneer
+            _unknown_users[user_id] = True
+            print(f"[ERROR] User not found when fetching summary: {user_id}")
+        else:
+            print(f"[ERROR] Failed to get user summary. Status: {response.status_code}, Response: {response.text}")
+        return None
+    except Exception as e:
+        print(f"[ERROR] Exception fetching user summary: {e}")
+        return None
+
+_summary_cache = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+_summary_fetches: Dict[tuple, asyncio.Task] = {}
+_unknown_users = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=UNKNOWN_USER_CACHE_TTL)
 
-async def get_relevant_chunks(user_id: str, conversation_history: List[Dict], k: int = 5):
+async def _fetch_and_cache_user_summary(client: httpx.AsyncClient, user_id: str, max_chars: int) -> Optional[str]:
+    summary = await get_user_summary(client, user_id, max_chars)
+    if summary is not None:
+        _summary_cache[(user_id, max_chars)] = summary
+    return summary
+
+async def get_cached_user_summary(client: httpx.AsyncClient, user_id: str, max_chars: int = 1000) -> Optional[str]:
+    """Get user profile summary, reusing a recent result and allowing one in-flight fetch per user"""
+    if user_id in _unknown_users:
+        return None
+    key = (user_id, max_chars)
+    if key in _summary_cache:
+        return _summary_cache[key]
+    
+    # Concurrent misses share a single fetch; the task fills the cache before it
+    # finishes, so there is no gap where a new caller could start a second fetch
+    fetch = _summary_fetches.get(key)
+    if fetch is None:
+        fetch = asyncio.create_task(_fetch_and_cache_user_summary(client, user_id, max_chars))
+        _summary_fetches[key] = fetch
+        fetch.add_done_callback(lambda _: _summary_fetches.pop(key, None))
+    # Shield so one caller disconnecting doesn't cancel the fetch for the others
+    return await asyncio.shield(fetch)
+
+async def get_relevant_chunks(client: httpx.AsyncClient, user_id: str, conversation_history: List[Dict], k: int = 5) -> List[Dict]:
     """Get relevant context chunks from Pioneer"""
-    async with httpx.AsyncClient() as client:
-        try:
-            # Format history for Pioneer API
-            history = [
-                {"role": msg["role"], "content": msg["content"]} 
-                for msg in conversation_history
-            ]
-            
-            response = await client.post(
-                f"{PIONEER_BASE_URL}/chunks",
-                headers=get_pioneer_headers(),
-                json={
-                    "user_id": user_id,
-                    "history": history,
-                    "k": k,
-                    "similarity_threshold": 0.25
-                },
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("chunks", [])
-            else:
-                print(f"[ERROR] Failed to get chunks. Status: {response.status_code}, Response: {response.text}")
-            return []
-        except Exception as e:
-            print(f"[ERROR] Exception fetching chunks: {e}")
-            return []
+    try:
+        # Format history for Pioneer API
+        history = [
+            {"role": msg["role"], "content": msg["content"]} 
+            for msg in conversation_history
+        ]
+        
+        response = await pioneer_request(
+            client,
+            "POST",
+            "/chunks",
+            content=orjson.dumps({
+                "user_id": user_id,
+                "history": history,
+                "k": k,
+                "similarity_threshold": 0.25
+            }),
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            return data.get("chunks") or []
+        else:
+            print(f"[ERROR] Failed to get chunks. Status: {response.status_code}, Response: {response.text}")
+        return []
+    except Exception as e:
+        print(f"[ERROR] Exception fetching chunks: {e}")
+        return []
 
-async def ingest_conversation(user_id: str, messages: List[Dict]):
+async def ingest_conversation(client: httpx.AsyncClient, user_id: str, messages: List[Dict]):
     """Ingest conversation into Pioneer for learning"""
-    async with httpx.AsyncClient() as client:
-        try:
-            # Format messages for Pioneer
-            formatted_messages = []
-            for msg in messages:
-                formatted_msg = {
+    try:
+        # Format messages for Pioneer and serialize straight to bytes
+        now = now_iso()
+        body = orjson.dumps({
+            "user_id": user_id,
+            "source": "chat_app",
+            "message_history": [
+                {
                     "role": msg["role"],
                     "content": msg["content"],
-                    "timestamp": msg.get("timestamp", datetime.utcnow().isoformat() + "Z")
+                    "timestamp": msg.get("timestamp") or now
                 }
-                formatted_messages.append(formatted_msg)
-            
-            payload = {
-                "user_id": user_id,
-                "source": "chat_app",
-                "message_history": formatted_messages,
-                "options": {"dedupe": True}
-            }
-            
-            response = await client.post(
-                f"{PIONEER_BASE_URL}/ingest",
-                headers=get_pioneer_headers(),
-                json=payload,
-                timeout=30.0
-            )
-            
-            if response.status_code not in [200, 202]:
-                print(f"[ERROR] Failed to ingest conversation. Status: {response.status_code}, Response: {response.text}", flush=True)
+                for msg in messages
+            ],
+            "options": {"dedupe": True}
+        })
+        
+        # Only the encoded body is held while waiting on Pioneer; bytes (unlike a
+        # streamed body) can also be resent as-is if the request is retried
+        response = await pioneer_request(
+            client,
+            "POST",
+            "/ingest",
+            content=body,
+            timeout=30.0
+        )
+        
+        if response.status_code not in [200, 202]:
+            print(f"[ERROR] Failed to ingest conversation. Status: {response.status_code}, Response: {response.text}", flush=True)
+        else:
+            print(f"[SUCCESS] Conversation ingested successfully. Response: {response.text}", flush=True)
+    except Exception as e:
+        print(f"[ERROR] Exception ingesting conversation: {e}", flush=True)
+
+class IngestBatcher:
+    """
+    Buffers new conversation messages per user and ingests them into Pioneer
+    in batches, flushing a user's buffer once it reaches max_batch messages or
+    its oldest message has waited max_wait seconds.
+    """
+    
+    def __init__(self, client: httpx.AsyncClient, max_batch: int = INGEST_MAX_BATCH, max_wait: float = INGEST_MAX_WAIT):
+        self.client = client
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending: Dict[str, List[Dict]] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._inflight = set()
+        self._worker: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the background worker on the running event loop"""
+        self._worker = asyncio.create_task(self._run())
+    
+    async def put(self, user_id: str, messages: List[Dict]):
+        """Queue new messages for ingestion"""
+        await self._queue.put((user_id, messages))
+    
+    async def close(self):
+        """Stop the worker and ingest everything still buffered"""
+        if self._worker:
+            # Stop via a sentinel rather than cancel(): wait_for() can swallow a
+            # cancellation that races with queue.get() completing
+            self._queue.put_nowait(None)
+            await self._worker
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                user_id, messages = item
+                self._pending.setdefault(user_id, []).extend(messages)
+        for user_id in list(self._pending):
+            self._flush(user_id)
+        if self._inflight:
+            await asyncio.gather(*self._inflight)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            timeout = None
+            if self._deadlines:
+                timeout = max(0.0, min(self._deadlines.values()) - loop.time())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                pass
             else:
-                print(f"[SUCCESS] Conversation ingested successfully. Response: {response.text}", flush=True)
-        except Exception as e:
-            print(f"[ERROR] Exception ingesting conversation: {e}", flush=True)
+                if item is None:
+                    return
+                user_id, messages = item
+                self._pending.setdefault(user_id, []).extend(messages)
+                self._deadlines.setdefault(user_id, loop.time() + self.max_wait)
+                if len(self._pending[user_id]) >= self.max_batch:
+                    self._flush(user_id)
+            
+            now = loop.time()
+            for user_id in [u for u, deadline in self._deadlines.items() if deadline <= now]:
+                self._flush(user_id)
+    
+    def _flush(self, user_id: str):
+        messages = self._pending.pop(user_id)
+        self._deadlines.pop(user_id, None)
+        task = asyncio.create_task(ingest_conversation(self.client, user_id, messages))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
 
-async def query_user_knowledge(user_id: str, question: str, use_cache: bool = True) -> Optional[str]:
+async def query_user_knowledge(client: httpx.AsyncClient, user_id: str, question: str, use_cache: bool = True) -> Optional[str]:
     """
     Query the Pioneer API to ask questions about the user's knowledge base.
     This allows the agent to ask specific questions and get detailed answers
     about the user's context, relationships, preferences, etc.
     
     Args:
+        client: The shared Pioneer HTTP client
         user_id: The user's ID
         question: The question to ask about the user
         use_cache: Whether to use cached results (default: True)
@@ -199,28 +433,28 @@ async def query_user_knowledge(user_id: str, question: str, use_cache: bool = Tr
     Returns:
         The answer to the question, or None if the query failed
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{PIONEER_BASE_URL}/query",
-                headers=get_pioneer_headers(),
-                json={
-                    "user_id": user_id,
-                    "question": question,
-                    "use_cache": use_cache
-                },
-                timeout=180.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("answer")
-            else:
-                print(f"[ERROR] Failed to query user knowledge. Status: {response.status_code}, Response: {response.text}")
-                return None
-        except Exception as e:
-            print(f"[ERROR] Exception querying user knowledge: {e}")
+    try:
+        response = await pioneer_request(
+            client,
+            "POST",
+            "/query",
+            content=orjson.dumps({
+                "user_id": user_id,
+                "question": question,
+                "use_cache": use_cache
+            }),
+            timeout=180.0
+        )
+        
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            return data.get("answer")
+        else:
+            print(f"[ERROR] Failed to query user knowledge. Status: {response.status_code}, Response: {response.text}")
             return None
+    except Exception as e:
+        print(f"[ERROR] Exception querying user knowledge: {e}")
+        return None
 
 # Tool definitions for OpenAI function calling
 QUERY_TOOL_DEFINITION = {
@@ -241,6 +475,97 @@ QUERY_TOOL_DEFINITION = {
     }
 }
 
+# System prompts, with and without the user's Pioneer profile
+SYSTEM_PROMPT = "You are a helpful AI assistant."
+SYSTEM_PROMPT_WITH_PROFILE = SYSTEM_PROMPT + "\n\nUser Profile:\n{summary}\n\nKeep the user's preferences and context in mind when responding."
+
+# Chat Helpers
+async def prepare_chat(request: ChatRequest):
+    """
+    Build the personalized OpenAI prompt for a chat request.
+    
+    Returns:
+        (user_id, conversation, messages, user_summary, chunks) where conversation
+        is the windowed history plus the new user message, ready for ingestion
+    """
+    # User ID is required - user must register first on frontend
+    if not request.user_id:
+        raise HTTPException(
+            status_code=400, 
+            detail="user_id is required. Please register on the frontend first."
+        )
+    
+    user_id = request.user_id
+    user_email = request.user_email  # For logging only
+    
+    print(f"[DEBUG] Processing chat for user_id: {user_id}, email: {user_email}")
+    
+    # Note: No need to re-register here - user_id was obtained during initial registration
+    
+    # Build conversation history, bounded to the most recent messages
+    history = trim_history(request.conversation_history)
+    conversation = [
+        *(msg.model_dump(exclude_none=True) for msg in history),
+        {"role": "user", "content": request.message, "timestamp": now_iso()}
+    ]
+    
+    # Get user profile summary and relevant context chunks concurrently
+    print(f"[DEBUG] Fetching user summary and relevant chunks for user_id: {user_id}")
+    user_summary, chunks = await asyncio.gather(
+        get_cached_user_summary(app.state.pioneer, user_id),
+        get_relevant_chunks(app.state.pioneer, user_id, conversation),
+        return_exceptions=True
+    )
+    if isinstance(user_summary, BaseException):
+        print(f"[ERROR] Exception fetching user summary: {user_summary}")
+        user_summary = None
+    if isinstance(chunks, BaseException):
+        print(f"[ERROR] Exception fetching chunks: {chunks}")
+        chunks = []
+    print(f"[DEBUG] User summary: {user_summary[:100] if user_summary else 'None'}")
+    print(f"[DEBUG] Retrieved {len(chunks)} chunks")
+    
+    # Build system prompt with personalization
+    system_prompt = SYSTEM_PROMPT
+    if user_summary:
+        system_prompt = SYSTEM_PROMPT_WITH_PROFILE.format(summary=user_summary)
+        print(f"[DEBUG] Added user profile to system prompt")
+    
+    # Build user message with context
+    user_message = request.message
+    if chunks:
+        context_text = "\n".join(f"- {chunk['text']}" for chunk in chunks if chunk.get("text"))
+        user_message += f"\n\n[Relevant context from past conversations:\n{context_text}]"
+        print(f"[DEBUG] Added {len(chunks)} context chunks to user message")
+    
+    # OpenAI messages: system prompt, conversation history and current message with context
+    messages = [
+        {"role": "system", "content": system_prompt},
+        *({"role": msg["role"], "content": msg["content"]} for msg in conversation[:-1]),
+        {"role": "user", "content": user_message},
+    ]
+    
+    return user_id, conversation, messages, user_summary, chunks
+
+async def create_chat_completion(messages: List[Dict], stream: bool = False):
+    """Call OpenAI chat completions with the app's model settings, retrying transient failures"""
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return await app.state.openai.chat.completions.create(
+                model="gpt-4.1",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=1000,
+                stream=stream,
+                # tools=[QUERY_TOOL_DEFINITION],  # Enable the query tool if needed. Since this demo is limited in data scope, we will not use it.
+            )
+        except (APIConnectionError, RateLimitError, InternalServerError) as e:
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            print(f"[ERROR] OpenAI request failed: {e!r}, retrying")
+            retry_after = e.response.headers.get("Retry-After") if isinstance(e, RateLimitError) else None
+            await asyncio.sleep(retry_delay(attempt, retry_after))
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -248,6 +573,7 @@ async def root():
         "message": "Pioneer + OpenAI Chat API",
         "endpoints": {
             "/chat": "POST - Send a message and get personalized response",
+            "/chat/stream": "POST - Same as /chat, streaming the response as plain text",
             "/register": "POST - Register a new user",
             "/health": "GET - Health check"
         }
@@ -262,6 +588,7 @@ async def register_user(request: RegisterUserRequest):
     """Register a new user with Pioneer"""
     try:
         result = await register_pioneer_user(
+            app.state.pioneer,
             email=request.email,
             name=request.name,
             timezone=request.timezone
@@ -286,85 +613,18 @@ async def chat(request: ChatRequest):
     4. Ingests the conversation back to Pioneer for learning
     """
     try:
-        # User ID is required - user must register first on frontend
-        if not request.user_id:
-            raise HTTPException(
-                status_code=400, 
-                detail="user_id is required. Please register on the frontend first."
-            )
-        
-        user_id = request.user_id
-        user_email = request.user_email  # For logging only
-        
-        print(f"[DEBUG] Processing chat for user_id: {user_id}, email: {user_email}")
-        
-        # Note: No need to re-register here - user_id was obtained during initial registration
-        
-        # Get user profile summary
-        print(f"[DEBUG] Fetching user summary for user_id: {user_id}")
-        user_summary = await get_user_summary(user_id)
-        print(f"[DEBUG] User summary: {user_summary[:100] if user_summary else 'None'}")
-        
-        # Build conversation history
-        conversation = [msg.model_dump() for msg in request.conversation_history]
-        conversation.append({
-            "role": "user",
-            "content": request.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
-        })
-        
-        # Get relevant context chunks
-        print(f"[DEBUG] Fetching relevant chunks for user_id: {user_id}")
-        chunks = await get_relevant_chunks(user_id, conversation)
-        print(f"[DEBUG] Retrieved {len(chunks)} chunks")
-        
-        # Build system prompt with personalization
-        system_prompt = "You are a helpful AI assistant."
-        if user_summary:
-            system_prompt += f"\n\nUser Profile:\n{user_summary}\n\nKeep the user's preferences and context in mind when responding."
-            print(f"[DEBUG] Added user profile to system prompt")
-        
-        # Build user message with context
-        user_message = request.message
-        if chunks:
-            context_text = "\n".join([f"- {chunk['text']}" for chunk in chunks])
-            user_message += f"\n\n[Relevant context from past conversations:\n{context_text}]"
-            print(f"[DEBUG] Added {len(chunks)} context chunks to user message")
-        
-        # Call OpenAI
-        messages = [
-            {"role": "system", "content": system_prompt},
-        ]
+        user_id, conversation, messages, user_summary, chunks = await prepare_chat(request)
         
-        # Add conversation history
-        for msg in request.conversation_history:
-            messages.append({"role": msg.role, "content": msg.content})
-        
-        # Add current message with context
-        messages.append({"role": "user", "content": user_message})
-        
-        completion = openai_client.chat.completions.create(
-            model="gpt-4.1",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000,
-            # tools=[QUERY_TOOL_DEFINITION],  # Enable the query tool if needed. Since this demo is limited in data scope, we will not use it.
-        )
+        completion = await create_chat_completion(messages)
         
         assistant_response = completion.choices[0].message.content
         
-        # Add assistant response to conversation for ingestion
-        conversation.append({
-            "role": "assistant",
-            "content": assistant_response,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
-        })
-        
-        # Ingest conversation back to Pioneer (async, don't wait)
-        # In production, you might want to do this in a background task
-        print(f"[DEBUG] Ingesting conversation for user_id: {user_id}")
-        await ingest_conversation(user_id, conversation)
-        print(f"[DEBUG] Conversation ingestion completed")
+        # Queue the new user message and assistant response for ingestion (don't wait)
+        print(f"[DEBUG] Queueing conversation ingestion for user_id: {user_id}")
+        await app.state.ingest_batcher.put(user_id, [
+            conversation[-1],
+            {"role": "assistant", "content": assistant_response, "timestamp": now_iso()}
+        ])
         
         return ChatResponse(
             response=assistant_response,
@@ -372,11 +632,77 @@ async def chat(request: ChatRequest):
             user_profile=user_summary
         )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same as /chat, but streams the assistant response as plain text while
+    OpenAI generates it. The new messages are queued for ingestion once the stream ends.
+    """
+    try:
+        user_id, conversation, messages, user_summary, chunks = await prepare_chat(request)
+        
+        completion = await create_chat_completion(messages, stream=True)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+    
+    async def generate():
+        collected = []
+        total_chars = 0
+        incomplete_reason = None
+        try:
+            async for chunk in completion:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if total_chars + len(delta) > MAX_STREAM_CHARS:
+                    incomplete_reason = f"exceeded {MAX_STREAM_CHARS} chars"
+                    break
+                total_chars += len(delta)
+                collected.append(delta)
+                for i in range(0, len(delta), MAX_STREAM_CHUNK_CHARS):
+                    yield delta[i:i + MAX_STREAM_CHUNK_CHARS]
+        except Exception as e:
+            incomplete_reason = f"upstream error: {e}"
+        finally:
+            # Return the OpenAI connection to the pool, including on client disconnect
+            await completion.response.aclose()
+        
+        if incomplete_reason:
+            # Tell the client the answer was cut off, and don't ingest a partial response
+            print(f"[ERROR] Streamed response for user_id {user_id} is incomplete: {incomplete_reason}")
+            yield STREAM_INCOMPLETE_MARKER
+            return
+        
+        # Queue the new user message and assistant response for ingestion (don't wait)
+        print(f"[DEBUG] Queueing conversation ingestion for user_id: {user_id}")
+        await app.state.ingest_batcher.put(user_id, [
+            conversation[-1],
+            {"role": "assistant", "content": "".join(collected), "timestamp": now_iso()}
+        ])
+    
+    # Mark the stream as uncompressed so GZipMiddleware doesn't buffer tokens
+    return StreamingResponse(generate(), media_type="text/plain", headers={"Content-Encoding": "identity"})
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
     port = int(os.getenv("BACKEND_PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("BACKEND_WORKERS", 2))
+    # Multiple workers need the app as an import string; uvloop is not available on Windows
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
+    )
 
@@ -3,6 +3,10 @@ import axios from 'axios';
 import './App.css';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || '/api';
+// Backend rejects longer histories; it only uses the most recent messages anyway
+const MAX_HISTORY_MESSAGES = 200;
+// Backend rejects longer chat messages
+const MAX_MESSAGE_LENGTH = 8000;
 
 function App() {
   const [messages, setMessages] = useState([]);
@@ -162,7 +166,7 @@ function App() {
     try {
       const response = await axios.post(`${API_BASE_URL}/chat`, {
         message: inputMessage,
-        conversation_history: messages,
+        conversation_history: messages.slice(-MAX_HISTORY_MESSAGES),
         user_id: userId,
         user_email: userEmail  // Send both for backward compatibility and debugging
       });
@@ -181,9 +185,16 @@ function App() {
       }
     } catch (error) {
       console.error('Error sending message:', error);
+      // A rejected message must not stay in history, or every later request is rejected too
+      if (error.response?.status === 422) {
+        setMessages(prev => prev.filter(msg => msg !== userMessage));
+      }
+      // Validation errors return a list of details rather than a string
+      const detail = error.response?.data?.detail;
+      const errorText = Array.isArray(detail) ? detail.map(d => d.msg).join('; ') : detail;
       const errorMessage = {
         role: 'assistant',
-        content: `Sorry, I encountered an error: ${error.response?.data?.detail || error.message}. Please make sure your API keys are configured correctly in the backend .env file.`,
+        content: `Sorry, I encountered an error: ${errorText || error.message}. Please make sure your API keys are configured correctly in the backend .env file.`,
         timestamp: new Date().toISOString(),
         isError: true
       };
@@ -468,6 +479,7 @@ function App() {
             value={inputMessage}
             onChange={(e) => setInputMessage(e.target.value)}
             placeholder="Type your message..."
+            maxLength={MAX_MESSAGE_LENGTH}
             disabled={isLoading}
             className="message-input"
           />